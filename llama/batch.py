@@ -0,0 +1,355 @@
+import asyncio
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+REQUEST_TIMEOUT = 600
+MAX_ATTEMPTS = 3
+
+
+class ServerUnreachable(Exception):
+    pass
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def endpoint_for(item):
+    """
+    Picks the OpenAI-compatible endpoint from the shape of a request line.
+    """
+    if "input" in item:
+        return "/v1/embeddings"
+    if "messages" in item:
+        return "/v1/chat/completions"
+    if "prompt" in item:
+        return "/v1/completions"
+    return None
+
+
+def scan_endpoints(input_path):
+    """
+    Returns the set of endpoints the input file will hit, so a launched
+    server can be started with the flags they need.
+    """
+    endpoints = set()
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(item, dict):
+                path = endpoint_for(item)
+                if path:
+                    endpoints.add(path)
+    return endpoints
+
+
+def http_json(url, method, path, body=None, timeout=5):
+    """
+    Sends a single request and returns (status, decoded JSON or None).
+    """
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        data = resp.read()
+        try:
+            return resp.status, json.loads(data) if data else None
+        except ValueError:
+            return resp.status, None
+    finally:
+        conn.close()
+
+
+def get_slot_count(url):
+    """
+    Asks a running llama-server how many parallel slots (-np) it was started with.
+    """
+    try:
+        status, data = http_json(url, "GET", "/props")
+    except OSError:
+        return None
+    if status == 200 and data:
+        return data.get("total_slots")
+    return None
+
+
+def start_server(args, cwd, log_path):
+    """
+    Starts llama-server in the background with its output sent to log_path.
+    """
+    log = open(log_path, "ab")
+    try:
+        return subprocess.Popen(args, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        log.close()
+
+
+def wait_for_server(url, proc, timeout=900):
+    """
+    Polls /health until the model is loaded. Returns False if the server
+    exits or does not become ready in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            status, _ = http_json(url, "GET", "/health", timeout=2)
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop_server(proc):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def load_checkpoint(output_path):
+    """
+    Returns the set of input line indices that already have a successful
+    result in the output file. Error records and a partially written
+    trailing line (from a crash) are dropped so those requests are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "rb") as f:
+        data = f.read()
+
+    kept = []
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            continue
+        try:
+            record = json.loads(line)
+            index = record["index"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        if "error" in record:
+            continue
+        done.add(index)
+        kept.append(line)
+
+    if sum(len(line) for line in kept) != len(data):
+        tmp = output_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.writelines(kept)
+        os.replace(tmp, output_path)
+    return done
+
+
+def count_requests(input_path):
+    count = 0
+    with open(input_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                count += 1
+    return count
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
+
+
+class Progress:
+    """Throttled single-line throughput and ETA display."""
+
+    def __init__(self, total, skipped, interval=0.5):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.errors = 0
+        self.tokens = 0
+        self.start = time.monotonic()
+        self.interval = interval
+        self.last_render = 0.0
+
+    def update(self, tokens, error=False):
+        self.done += 1
+        self.tokens += tokens
+        if error:
+            self.errors += 1
+        now = time.monotonic()
+        if now - self.last_render >= self.interval:
+            self.last_render = now
+            self.render(now)
+
+    def render(self, now=None):
+        elapsed = max((now or time.monotonic()) - self.start, 1e-6)
+        rate = self.done / elapsed
+        remaining = self.total - self.skipped - self.done
+        eta = format_duration(remaining / rate) if rate > 0 else "?"
+        sys.stdout.write(
+            f"\r{self.skipped + self.done}/{self.total} | {rate:.2f} req/s | "
+            f"{self.tokens / elapsed:.0f} tok/s | errors {self.errors} | ETA {eta}   "
+        )
+        sys.stdout.flush()
+
+
+class Client:
+    """Keep-alive HTTP connection owned by a single batch worker."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.conn = None
+
+    def post(self, path, body):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+        try:
+            self.conn.request("POST", path, body=json.dumps(body), headers={"Content-Type": "application/json"})
+            resp = self.conn.getresponse()
+            data = resp.read()
+        except Exception:
+            self.close()
+            raise
+        if resp.status != 200:
+            raise HTTPStatusError(resp.status, data[:200].decode("utf-8", errors="replace"))
+        return json.loads(data)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+async def process_line(loop, executor, client, index, line):
+    """
+    Sends one input line to the server, retrying transient failures.
+    Returns (output record, token count).
+    """
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return {"index": index, "error": f"Invalid JSON: {e}"}, 0
+    if not isinstance(item, dict):
+        return {"index": index, "error": "Expected a JSON object"}, 0
+
+    request_id = item.pop("id", None)
+    path = endpoint_for(item)
+    if path is None:
+        return {"index": index, "id": request_id, "error": "Expected 'prompt', 'messages' or 'input'"}, 0
+
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            data = await loop.run_in_executor(executor, client.post, path, item)
+        except Exception as e:
+            error = e
+            # Only connection drops and server-side errors (e.g. 503 while
+            # the model loads) are worth retrying; 4xx means a bad request.
+            transient = isinstance(e, ConnectionError) or (
+                isinstance(e, HTTPStatusError) and e.status >= 500
+            )
+            if not transient:
+                break
+            if attempt < MAX_ATTEMPTS - 1:
+                await asyncio.sleep(2**attempt)
+            continue
+        usage = data.get("usage") or {}
+        tokens = usage.get("completion_tokens", usage.get("prompt_tokens", 0))
+        return {"index": index, "id": request_id, "response": data}, tokens
+
+    # A dead server would otherwise turn every remaining line into an error
+    if isinstance(error, ConnectionError):
+        raise ServerUnreachable(str(error))
+    return {"index": index, "id": request_id, "error": str(error)}, 0
+
+
+async def run_batch(input_path, output_path, url, np_slots):
+    """
+    Streams input_path through the server keeping exactly np_slots requests
+    in flight. Results are appended to output_path as they complete, and the
+    output doubles as the checkpoint for resuming an interrupted run.
+    Returns 0 if every request succeeded, 1 otherwise.
+    """
+    done = load_checkpoint(output_path)
+    total = count_requests(input_path)
+    if done:
+        print(f"Resuming: {len(done)} of {total} requests already completed.")
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=np_slots)
+    queue = asyncio.Queue(maxsize=np_slots * 2)
+    progress = Progress(total, len(done))
+
+    async def producer():
+        with open(input_path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                line = line.strip()
+                if line and index not in done:
+                    await queue.put((index, line))
+        for _ in range(np_slots):
+            await queue.put(None)
+
+    async def worker(out):
+        client = Client(url)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                record, tokens = await process_line(loop, executor, client, *item)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                progress.update(tokens, error="error" in record)
+        finally:
+            client.close()
+
+    print(f"Running batch against {url} with {np_slots} parallel slot(s)...")
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            tasks = [asyncio.ensure_future(producer())]
+            tasks += [asyncio.ensure_future(worker(out)) for _ in range(np_slots)]
+            finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in finished:
+                task.result()
+    except ServerUnreachable as e:
+        progress.render()
+        print(f"\n\n[ERROR] Server unreachable ({e}), stopping the batch.")
+        print("Re-run the same command to resume from where it stopped.")
+        return 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    progress.render()
+    print()
+    elapsed = time.monotonic() - progress.start
+    status = "[WARNING]" if progress.errors else "[OK]"
+    print(f"{status} Processed {progress.done} requests in {format_duration(elapsed)} ({progress.errors} errors).")
+    print(f"Results written to {output_path}")
+    return 1 if progress.errors else 0
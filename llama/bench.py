@@ -0,0 +1,239 @@
+import json
+import os
+import re
+import subprocess
+import time
+from utils import (
+    check_command_exists,
+    get_gguf_files,
+    load_config,
+    save_config,
+    prompt_model_selection,
+    Spinner,
+)
+from stats import STATS_DB, connect
+
+default_threshold = "5"
+bench_prompt_tokens = 512
+bench_gen_tokens = 128
+bench_repetitions = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmarks (
+    ts REAL NOT NULL,
+    version TEXT NOT NULL,
+    build_commit TEXT,
+    model TEXT NOT NULL,
+    pp_tps REAL,
+    tg_tps REAL
+);
+"""
+
+
+def get_llama_version():
+    """
+    Returns the linked llama.cpp version as reported by Homebrew (without the
+    '_N' revision suffix, so it can be passed to 'brew extract'), falling
+    back to 'llama-server --version'.
+    """
+    try:
+        output = subprocess.check_output(
+            ["brew", "info", "--json=v2", "llama.cpp"], text=True
+        )
+        formula = json.loads(output)["formulae"][0]
+        version = formula.get("linked_keg")
+        if not version and formula.get("installed"):
+            version = formula["installed"][-1]["version"]
+        if version:
+            return re.sub(r"_\d+$", "", version)
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError, IndexError):
+        pass
+    try:
+        result = subprocess.run(
+            ["llama-server", "--version"], capture_output=True, text=True
+        )
+        m = re.search(r"version:\s*(\d+)", result.stdout + result.stderr)
+        if m:
+            return m.group(1)
+    except OSError:
+        pass
+    return "unknown"
+
+
+def get_bench_model():
+    """
+    Returns the model used for upgrade benchmarks ('default_model' in config),
+    asking the user to pick one on first use. Returns None if no models exist.
+    """
+    config = load_config()
+    model = config.get("default_model")
+    if model and os.path.exists(os.path.expanduser(model)):
+        return os.path.expanduser(model)
+
+    if not get_gguf_files():
+        return None
+
+    print("\nSelect the default model to benchmark (saved for future upgrades).")
+    model = prompt_model_selection()
+    config["default_model"] = model
+    save_config(config)
+    return model
+
+
+def run_benchmark(model):
+    """
+    Runs a short llama-bench pass (prompt processing + generation).
+    Returns a dict with pp/tg tokens per second, or None on failure.
+    """
+    cmd = [
+        "llama-bench",
+        "-m", model,
+        "-p", str(bench_prompt_tokens),
+        "-n", str(bench_gen_tokens),
+        "-r", str(bench_repetitions),
+        "-o", "json",
+    ]
+    try:
+        with Spinner(f"Benchmarking {os.path.basename(model)}..."):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        print(f"\n[ERROR] Could not run llama-bench: {e}")
+        return None
+
+    if result.returncode != 0:
+        print("\n[ERROR] llama-bench failed:")
+        print(result.stderr.strip()[-500:])
+        return None
+
+    try:
+        rows = json.loads(result.stdout)
+    except ValueError:
+        print("\n[ERROR] Could not parse llama-bench output.")
+        return None
+
+    bench = {"pp_tps": None, "tg_tps": None, "build_commit": None}
+    for row in rows:
+        bench["build_commit"] = row.get("build_commit")
+        if row.get("n_gen", 0) == 0:
+            bench["pp_tps"] = row.get("avg_ts")
+        elif row.get("n_prompt", 0) == 0:
+            bench["tg_tps"] = row.get("avg_ts")
+    return bench
+
+
+def save_benchmark(version, model, bench, path=STATS_DB):
+    conn = connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute(
+            "INSERT INTO benchmarks VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                time.time(),
+                version,
+                bench["build_commit"],
+                os.path.basename(model),
+                bench["pp_tps"],
+                bench["tg_tps"],
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def benchmark_current(model):
+    """
+    Benchmarks the installed llama.cpp build and stores the result.
+    Returns (version, bench) or None.
+    """
+    version = get_llama_version()
+    bench = run_benchmark(model)
+    if bench is None:
+        return None
+    save_benchmark(version, model, bench)
+    print(
+        f"[llama.cpp {version}] PP: {bench['pp_tps'] or 0:.1f} t/s, TG: {bench['tg_tps'] or 0:.1f} t/s"
+    )
+    return version, bench
+
+
+def get_threshold():
+    try:
+        return float(load_config().get("bench_threshold", default_threshold))
+    except ValueError:
+        return float(default_threshold)
+
+
+def has_local_tap():
+    try:
+        output = subprocess.check_output(["brew", "tap"], text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return "local/llama" in output.split()
+
+
+def rollback_commands(version):
+    """
+    Returns the Homebrew commands that reinstall the given llama.cpp version.
+    Steps that already happened on an earlier rollback are skipped or forced.
+    """
+    commands = ["brew tap --force homebrew/core"]
+    if not has_local_tap():
+        commands.append("brew tap-new --no-git local/llama")
+    commands += [
+        f"brew extract --force --version={version} llama.cpp local/llama",
+        "brew unlink llama.cpp",
+        f"brew install local/llama/llama.cpp@{version}",
+    ]
+    return commands
+
+
+def compare_benchmarks(before, after):
+    """
+    Prints the before/after comparison and flags slowdowns beyond the
+    configured threshold. Returns True if a regression was found.
+    """
+    old_version, old = before
+    new_version, new = after
+    threshold = get_threshold()
+    regressed = False
+
+    print(f"\nPerformance: llama.cpp {old_version} -> {new_version}")
+    for key, label in (("pp_tps", "Prompt processing"), ("tg_tps", "Generation")):
+        if not old[key] or not new[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        print(f"  {label:<18} {old[key]:>8.1f} -> {new[key]:>8.1f} t/s ({change:+.1f}%)")
+        if change < -threshold:
+            regressed = True
+
+    if regressed:
+        print(f"\n[WARNING] Slowdown beyond {threshold:g}% detected after upgrading.")
+        if old_version != "unknown":
+            print("To roll back to the previous version, run:")
+            for command in rollback_commands(old_version):
+                print(f"  {command}")
+    else:
+        print(f"\n[OK] No slowdown beyond {threshold:g}%.")
+    return regressed
+
+
+def prepare_gate():
+    """
+    Picks the benchmark model and records a baseline for the installed build.
+    Returns (model, baseline) or None if the gate cannot run.
+    """
+    if not check_command_exists("llama-bench"):
+        print("\n[NOTE] 'llama-bench' not found in PATH, skipping performance gate.")
+        return None
+
+    model = get_bench_model()
+    if not model:
+        print("\n[NOTE] No models available to benchmark, skipping performance gate.")
+        return None
+
+    print("\nBenchmarking current build before upgrade...")
+    baseline = benchmark_current(model)
+    if baseline is None:
+        return None
+    return model, baseline
@@ -1,6 +1,6 @@
 import subprocess
 import sys
-from utils import check_command_exists, prompt_bool, Spinner
+from utils import check_command_exists, load_config, prompt_bool, Spinner
 
 
 def check_python_version() -> bool:
@@ -59,7 +59,26 @@ def check_and_install_llama() -> bool:
             if is_outdated:
                 print("\n[INFO] A newer version of llama.cpp is available via Homebrew.")
                 if prompt_bool("Update now?", False):
+                    gate = None
+                    if prompt_bool(
+                        "Run performance gate?",
+                        load_config().get("bench_gate") == "true",
+                        description="Benchmark the default model before and after upgrading and flag slowdowns.",
+                    ):
+                        from bench import prepare_gate
+
+                        gate = prepare_gate()
+
                     print("Running: brew upgrade llama.cpp")
-                    subprocess.run(["brew", "upgrade", "llama.cpp"])
+                    result = subprocess.run(["brew", "upgrade", "llama.cpp"])
+
+                    if gate and result.returncode == 0:
+                        from bench import benchmark_current, compare_benchmarks
+
+                        model, baseline = gate
+                        print("\nBenchmarking upgraded build...")
+                        upgraded = benchmark_current(model)
+                        if upgraded:
+                            compare_benchmarks(baseline, upgraded)
 
     return True
@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
 import os
 import sys
 from utils import (
@@ -11,8 +13,19 @@ from utils import (
     format_bytes,
     is_port_in_use,
     get_advanced_memory_stats,
+    Spinner,
+    get_gguf_files,
 )
 from installer import check_and_install_llama, check_python_version
+from stats import run_with_capture, print_stats
+from batch import run_batch, scan_endpoints, get_slot_count, start_server, wait_for_server, stop_server
+from verify import (
+    verify_models,
+    print_verify_report,
+    write_manifest,
+    load_manifest,
+    compare_manifest,
+)
 
 
 default_model = None
@@ -33,18 +46,23 @@ default_top_p = "0.95"
 default_top_k = "20"
 default_min_p = "0.00"
 default_thinking = False
+default_capture = False
 
 
-def main():
+def configure_server():
+    """
+    Runs the interactive prompts and returns the resolved server settings
+    (including the llama-server argv), or None if the user aborted.
+    """
     print("=" * 40)
     print("Llama Command Builder")
     print("=" * 40)
 
     if not check_python_version():
-        return
+        return None
 
     if not check_and_install_llama():
-        return
+        return None
 
     # Calculate System RAM info
     total_ram = get_total_system_memory()
@@ -80,7 +98,7 @@ def main():
                 f"\n[CRITICAL] Model size ({format_bytes(size)}) exceeds estimated available RAM ({format_bytes(limit_to_use)})!"
             )
             if not prompt_bool("Are you sure you want to use this model?", False):
-                return
+                return None
 
     # Check RAM vs Model Size + Context
     model_size = 0
@@ -224,6 +242,9 @@ def main():
         default_np,
         description="Number of simultaneous requests to process.",
     )
+    while not (np_slots.isdigit() and int(np_slots) > 0):
+        print("Please enter a positive whole number.")
+        np_slots = prompt_value("Parallel Slots (-np)", default_np)
 
     flash_attn = prompt_bool(
         "Flash Attention (-fa)",
@@ -277,12 +298,88 @@ def main():
 
     full_command = " ".join(cmd_parts)
 
+    final_args = [
+        "llama-server",
+        "-m",
+        model,
+        "--alias",
+        alias,
+        "-c",
+        ctx,
+        "-n",
+        n_predict,
+        "-ngl",
+        ngl,
+        "-b",
+        batch,
+        "-ub",
+        ubatch,
+        "--temp",
+        temp,
+        "--top-p",
+        top_p,
+        "--top-k",
+        top_k,
+        "--min-p",
+        min_p,
+        "--host",
+        host,
+        "--port",
+        port,
+        "-np",
+        np_slots,
+    ]
+
+    if flash_attn:
+        final_args.append("-fa")
+        final_args.append("auto")
+    if jinja:
+        final_args.append("--jinja")
+    if not enable_thinking:
+        final_args.append("--chat-template-kwargs")
+        final_args.append('{"enable_thinking":false}')
+    if verbose:
+        final_args.append("--verbose")
+
+    return {
+        "model": model,
+        "alias": alias,
+        "host": host,
+        "port": port,
+        "np_slots": np_slots,
+        "lan_access": lan_access,
+        "command": full_command,
+        "args": final_args,
+    }
+
+
+def get_model_cwd():
+    """
+    Returns the expanded model directory the server should run from, or None.
+    """
+    model_dir = get_model_dir()
+    if model_dir:
+        expanded_dir = os.path.expanduser(model_dir)
+        if os.path.isdir(expanded_dir):
+            return expanded_dir
+    return None
+
+
+def main():
+    server = configure_server()
+    if server is None:
+        return
+
+    model = server["model"]
+    alias = server["alias"]
+    port = server["port"]
+
     print("\nGenerated Command:")
     print("-" * 40)
-    print(full_command)
+    print(server["command"])
     print("-" * 40)
 
-    if lan_access:
+    if server["lan_access"]:
         from utils import get_local_ip
 
         local_ip = get_local_ip()
@@ -300,13 +397,7 @@ def main():
         True,
         description="Execute the server command immediately.",
     ):
-        cwd = None
-
-        model_dir = get_model_dir()
-        if model_dir:
-            expanded_dir = os.path.expanduser(model_dir)
-            if os.path.isdir(expanded_dir):
-                cwd = expanded_dir
+        cwd = get_model_cwd()
 
         if not cwd:
             print("\nError: Could not determine model directory from configuration.")
@@ -315,65 +406,188 @@ def main():
             )
             return
 
+        capture = prompt_bool(
+            "Capture Request Timings",
+            default_capture,
+            description="Pipe server logs through a parser and record per-request throughput (see 'llama stats').",
+        )
+
         print(f"\nSwitching to directory: {cwd}")
         print("Starting server...")
 
         try:
             os.chdir(cwd)
 
-            final_args = [
-                "llama-server",
-                "-m",
-                model,
-                "--alias",
-                alias,
-                "-c",
-                ctx,
-                "-n",
-                n_predict,
-                "-ngl",
-                ngl,
-                "-b",
-                batch,
-                "-ub",
-                ubatch,
-                "--temp",
-                temp,
-                "--top-p",
-                top_p,
-                "--top-k",
-                top_k,
-                "--min-p",
-                min_p,
-                "--host",
-                host,
-                "--port",
-                port,
-                "-np",
-                np_slots,
-            ]
-
-            if flash_attn:
-                final_args.append("-fa")
-                final_args.append("auto")
-            if jinja:
-                final_args.append("--jinja")
-            if not enable_thinking:
-                final_args.append("--chat-template-kwargs")
-                final_args.append('{"enable_thinking":false}')
-            if verbose:
-                final_args.append("--verbose")
-
-            os.execvp("llama-server", final_args)
+            if capture:
+                sys.exit(
+                    run_with_capture(
+                        server["args"], model=os.path.basename(model), profile=alias
+                    )
+                )
+
+            os.execvp("llama-server", server["args"])
         except FileNotFoundError:
             print("\nError: 'llama-server' command not found in PATH.")
         except Exception as e:
             print(f"\nError executing command: {e}")
 
 
-if __name__ == "__main__":
+def batch(args):
+    """
+    Runs a JSONL batch against an existing server (--url) or one launched
+    with the interactive builder settings. Returns the process exit code.
+    """
+    output = args.output or os.path.splitext(args.input)[0] + ".out.jsonl"
+    if not os.path.exists(args.input):
+        print(f"\n[ERROR] Input file '{args.input}' not found.")
+        return 1
+
+    proc = None
+    if args.url:
+        url = args.url.rstrip("/")
+        np_slots = args.np or get_slot_count(url)
+        if not np_slots:
+            print(f"\n[WARNING] Could not read slot count from {url}/props, using 1.")
+            np_slots = 1
+    else:
+        # llama-server only serves /v1/embeddings when started with --embeddings,
+        # and that mode is not meant for completions
+        endpoints = scan_endpoints(args.input)
+        embeddings = "/v1/embeddings" in endpoints
+        if embeddings and len(endpoints) > 1:
+            print("\n[ERROR] The input mixes embedding and completion requests.")
+            print("Split it into separate files, or attach to running servers with --url.")
+            return 1
+
+        server = configure_server()
+        if server is None:
+            return 1
+
+        cwd = get_model_cwd()
+        if not cwd:
+            print("\nError: Could not determine model directory from configuration.")
+            return 1
+
+        if embeddings:
+            server["args"].append("--embeddings")
+
+        host = "127.0.0.1" if server["host"] == "0.0.0.0" else server["host"]
+        url = f"http://{host}:{server['port']}"
+        np_slots = int(server["np_slots"])
+        log_path = output + ".server.log"
+
+        print(f"\nStarting server (log: {log_path})")
+        try:
+            proc = start_server(server["args"], cwd, log_path)
+        except FileNotFoundError:
+            print("\nError: 'llama-server' command not found in PATH.")
+            return 1
+        with Spinner("Waiting for model to load..."):
+            ready = wait_for_server(url, proc)
+        if not ready:
+            print(f"\n[ERROR] Server did not become ready. See {log_path}")
+            stop_server(proc)
+            return 1
+
     try:
+        return asyncio.run(run_batch(args.input, output, url, np_slots))
+    finally:
+        if proc:
+            stop_server(proc)
+
+
+def verify(args):
+    """
+    Checks every model in the configured directory (or the given files).
+    """
+    files = args.files or get_gguf_files()
+    if not files:
+        print("\n[ERROR] No .gguf models found in the configured directory.")
+        return 1
+
+    manifest = None
+    if args.check:
+        try:
+            manifest = load_manifest(args.check)
+        except (OSError, ValueError) as e:
+            print(f"\n[ERROR] Could not read manifest '{args.check}': {e}")
+            return 1
+
+    results = verify_models(files, force=args.force)
+    if manifest is not None:
+        results = compare_manifest(results, manifest, report_missing=not args.files)
+    failed = print_verify_report(results)
+
+    if args.export:
+        write_manifest(results, args.export)
+        print(f"Manifest written to {args.export}")
+    return 1 if failed else 0
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description="Build and launch llama-server commands."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="Summarize captured request throughput per model and profile."
+    )
+    stats_parser.add_argument(
+        "--days", type=int, default=30, help="How many days back to include."
+    )
+    stats_parser.add_argument(
+        "--model", default=None, help="Only show models whose name contains this."
+    )
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Run a JSONL file of completion/embedding requests."
+    )
+    batch_parser.add_argument("input", help="JSONL file, one request per line.")
+    batch_parser.add_argument(
+        "-o", "--output", default=None, help="Results file (default: <input>.out.jsonl)."
+    )
+    batch_parser.add_argument(
+        "--url", default=None, help="Attach to a running server instead of launching one."
+    )
+    batch_parser.add_argument(
+        "-np", dest="np", type=int, default=None,
+        help="Requests in flight when attaching (default: the server's slot count).",
+    )
+
+    verify_parser = subparsers.add_parser(
+        "verify", help="Check GGUF files against their headers and cache digests."
+    )
+    verify_parser.add_argument(
+        "files", nargs="*", help="Files to check (default: all models in the model directory)."
+    )
+    verify_parser.add_argument(
+        "--force", action="store_true", help="Re-hash files even if the cached digest is current."
+    )
+    verify_parser.add_argument(
+        "--export", metavar="MANIFEST", default=None,
+        help="Write the digests of passing files to a manifest for other machines.",
+    )
+    verify_parser.add_argument(
+        "--check", metavar="MANIFEST", default=None,
+        help="Compare digests against a manifest exported on another machine.",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print_stats(days=args.days, model_filter=args.model)
+    elif args.command == "batch":
+        sys.exit(batch(args))
+    elif args.command == "verify":
+        sys.exit(verify(args))
+    else:
         main()
+
+
+if __name__ == "__main__":
+    try:
+        cli()
     except KeyboardInterrupt:
         print("\nAborted.")
         sys.exit(0)
@@ -0,0 +1,285 @@
+import os
+import queue
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+STATS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stats.db")
+
+# llama-server tags slot log lines with "id <slot> | task <task>"
+TASK_RE = re.compile(r"\bid\s+(\d+)\s*\|\s*task\s+(\d+)")
+N_PROMPT_RE = re.compile(r"\bn_prompt_tokens\s*=\s*(\d+)")
+SEQ_RM_RE = re.compile(r"(?:kv cache rm|memory_seq_rm)\s*\[(\d+),")
+PROMPT_EVAL_RE = re.compile(r"prompt eval time\s*=\s*([\d.]+)\s*ms\s*/\s*(\d+)\s*tokens")
+EVAL_RE = re.compile(r"(?<!prompt )eval time\s*=\s*([\d.]+)\s*ms\s*/\s*(\d+)\s*tokens")
+TOTAL_RE = re.compile(r"total time\s*=\s*([\d.]+)\s*ms")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    ts REAL NOT NULL,
+    model TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    slot INTEGER,
+    task INTEGER,
+    prompt_tokens INTEGER,
+    cached_tokens INTEGER,
+    prompt_ms REAL,
+    gen_tokens INTEGER,
+    gen_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_ts ON requests (ts);
+"""
+
+
+class TimingParser:
+    """
+    Incremental parser for llama-server log lines.
+    Feed it one line at a time; it returns a finished request dict
+    once the 'total time' line for a task has been seen.
+    """
+
+    def __init__(self):
+        # One in-progress entry per slot; a slot picking up a new task
+        # replaces the previous one, so tasks that never print timings
+        # (embeddings, cancelled requests) cannot accumulate.
+        self.slots = {}
+        self.current = None
+
+    def _task(self, slot, task_id):
+        entry = self.slots.get(slot)
+        if entry is None or entry["task"] != task_id:
+            entry = {"task": task_id, "slot": slot}
+            self.slots[slot] = entry
+        return entry
+
+    def feed(self, line):
+        if "time =" in line:
+            return self._feed_timing(line)
+        if "task" in line:
+            self._feed_task(line)
+        return None
+
+    def _feed_task(self, line):
+        m = TASK_RE.search(line)
+        if not m:
+            return
+        slot, task_id = int(m.group(1)), int(m.group(2))
+        self.current = slot
+        entry = self._task(slot, task_id)
+
+        m = N_PROMPT_RE.search(line)
+        if m:
+            entry["n_prompt"] = int(m.group(1))
+            return
+        m = SEQ_RM_RE.search(line)
+        if m and "cached" not in entry:
+            entry["cached"] = int(m.group(1))
+
+    def _feed_timing(self, line):
+        # Timing lines may carry the task tag themselves or follow a
+        # "print_timing: id X | task Y |" header line
+        m = TASK_RE.search(line)
+        if m:
+            self.current = int(m.group(1))
+            self._task(self.current, int(m.group(2)))
+        entry = self.slots.get(self.current)
+        if entry is None:
+            return None
+
+        m = PROMPT_EVAL_RE.search(line)
+        if m:
+            entry["prompt_ms"] = float(m.group(1))
+            entry["prompt_eval"] = int(m.group(2))
+            return None
+        m = EVAL_RE.search(line)
+        if m:
+            entry["gen_ms"] = float(m.group(1))
+            entry["gen_tokens"] = int(m.group(2))
+            return None
+        if TOTAL_RE.search(line):
+            return self._finish(self.slots.pop(self.current))
+        return None
+
+    def _finish(self, entry):
+        prompt_eval = entry.get("prompt_eval", 0)
+        n_prompt = entry.get("n_prompt")
+        if n_prompt is not None:
+            # Tokens not re-evaluated were served from the KV cache
+            cached = max(n_prompt - prompt_eval, 0)
+        else:
+            cached = entry.get("cached", 0)
+            n_prompt = prompt_eval + cached
+        return {
+            "slot": entry.get("slot"),
+            "task": entry["task"],
+            "prompt_tokens": n_prompt,
+            "cached_tokens": cached,
+            "prompt_ms": entry.get("prompt_ms", 0.0),
+            "gen_tokens": entry.get("gen_tokens", 0),
+            "gen_ms": entry.get("gen_ms", 0.0),
+        }
+
+
+def connect(path=STATS_DB):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class StatsStore:
+    """
+    Background writer that batches request rows into SQLite so the
+    log-reading loop never blocks on disk I/O.
+    """
+
+    _STOP = object()
+
+    def __init__(self, model, profile, path=STATS_DB, batch_size=64, flush_interval=2.0):
+        self.model = model
+        self.profile = profile
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def record(self, row):
+        self.queue.put((
+            time.time(),
+            self.model,
+            self.profile,
+            row["slot"],
+            row["task"],
+            row["prompt_tokens"],
+            row["cached_tokens"],
+            row["prompt_ms"],
+            row["gen_tokens"],
+            row["gen_ms"],
+        ))
+
+    def _write(self, conn, rows):
+        if rows:
+            conn.executemany("INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def _run(self):
+        conn = connect(self.path)
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = None
+                if item is not None and item is not StatsStore._STOP:
+                    pending.append(item)
+                if (
+                    item is StatsStore._STOP
+                    or len(pending) >= self.batch_size
+                    or time.monotonic() >= deadline
+                ):
+                    self._write(conn, pending)
+                    pending = []
+                    deadline = time.monotonic() + self.flush_interval
+                if item is StatsStore._STOP:
+                    break
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.queue.put(StatsStore._STOP)
+        if self.thread:
+            self.thread.join()
+
+
+def run_with_capture(args, model, profile):
+    """
+    Runs llama-server with stdout/stderr piped through the timing parser.
+    Output is echoed to the terminal unchanged. Returns the server's exit
+    status, with signal terminations mapped to 128 + signal.
+    """
+    parser = TimingParser()
+    out = sys.stdout.buffer
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    with StatsStore(model, profile) as store:
+        try:
+            for raw in proc.stdout:
+                out.write(raw)
+                out.flush()
+                # Cheap byte-level prefilter before decoding/regex work
+                if b"time =" not in raw and b"task" not in raw:
+                    continue
+                row = parser.feed(raw.decode("utf-8", errors="replace"))
+                if row:
+                    store.record(row)
+        except KeyboardInterrupt:
+            # The server receives the same SIGINT; give it time to shut down
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+    # Killed by a signal: report it the way a shell would (128 + signal)
+    if proc.returncode < 0:
+        return 128 - proc.returncode
+    return proc.returncode
+
+
+def print_stats(days=30, model_filter=None, path=STATS_DB):
+    """
+    Prints daily throughput per model and profile.
+    """
+    if not os.path.exists(path):
+        print("No stats recorded yet. Launch the server with timing capture enabled.")
+        return
+
+    since = (datetime.now() - timedelta(days=days)).timestamp()
+    query = """
+        SELECT model, profile, date(ts, 'unixepoch', 'localtime') AS day,
+               COUNT(*), SUM(prompt_tokens), SUM(cached_tokens),
+               SUM(prompt_tokens - cached_tokens), SUM(prompt_ms),
+               SUM(gen_tokens), SUM(gen_ms)
+        FROM requests
+        WHERE ts >= ?
+    """
+    params = [since]
+    if model_filter:
+        query += " AND model LIKE ?"
+        params.append(f"%{model_filter}%")
+    query += " GROUP BY model, profile, day ORDER BY model, profile, day"
+
+    conn = connect(path)
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        print(f"No requests recorded in the last {days} days.")
+        return
+
+    header = f"  {'Date':<12}{'Reqs':>7}{'Prompt':>10}{'Cached':>9}{'Gen':>9}{'PP t/s':>10}{'TG t/s':>10}"
+    last_key = None
+    for model, profile, day, reqs, prompt, cached, evaluated, prompt_ms, gen, gen_ms in rows:
+        if (model, profile) != last_key:
+            print(f"\n{model} [{profile}]")
+            print(header)
+            print("  " + "-" * (len(header) - 2))
+            last_key = (model, profile)
+        pp_tps = evaluated / prompt_ms * 1000 if prompt_ms else 0.0
+        tg_tps = gen / gen_ms * 1000 if gen_ms else 0.0
+        print(f"  {day:<12}{reqs:>7}{prompt:>10}{cached:>9}{gen:>9}{pp_tps:>10.1f}{tg_tps:>10.1f}")
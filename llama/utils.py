@@ -168,7 +168,9 @@ def prompt_for_config_setup():
         else:
             return None
 
-    save_config({"model_dir": path})
+    config = load_config()
+    config["model_dir"] = path
+    save_config(config)
     print(f"Configuration saved to {CONFIG_FILE}")
     return path
 
@@ -226,12 +228,22 @@ def prompt_model_selection(ram_info=None):
         print("Please add models to your configured directory and try again.")
         sys.exit(1)
 
+    # Optionally verify integrity (only new or changed files are hashed)
+    verified = {}
+    if load_config().get("verify_models") == "true":
+        from verify import verify_models
+
+        verified = verify_models(gguf_files, quiet=True)
+
     print("\nAvailable Models:")
     
     # Display numbered list
     for i, f in enumerate(gguf_files):
         size = os.path.getsize(f)
-        print(f"{i+1}) {os.path.basename(f)} ({format_bytes(size)})")
+        status = ""
+        if f in verified and not verified[f]["ok"]:
+            status = f" [CORRUPT: {verified[f]['error']}]"
+        print(f"{i+1}) {os.path.basename(f)} ({format_bytes(size)}){status}")
     
     print("-"*40)
     if ram_info:
@@ -245,6 +257,10 @@ def prompt_model_selection(ram_info=None):
             idx = int(user_input) - 1
             if 0 <= idx < len(gguf_files):
                 selected_model = gguf_files[idx]
+                if selected_model in verified and not verified[selected_model]["ok"]:
+                    print("\n[WARNING] This model failed the integrity check.")
+                    if not prompt_bool("Use it anyway?", False):
+                        continue
                 print(f"Selected: {os.path.basename(selected_model)}")
                 return selected_model
             else:
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from utils import CONFIG_FILE, format_bytes, Spinner
+
+DIGEST_CACHE = os.path.join(os.path.dirname(CONFIG_FILE), "digests.json")
+CHUNK_SIZE = 64 * 1024 * 1024
+DIGEST_ALGO = "sha256-tree-64M"
+
+GGUF_MAGIC = b"GGUF"
+GGUF_DEFAULT_ALIGNMENT = 32
+
+# Metadata value types: fixed byte sizes (strings and arrays handled separately)
+GGUF_VALUE_SIZES = {0: 1, 1: 1, 2: 2, 3: 2, 4: 4, 5: 4, 6: 4, 7: 1, 10: 8, 11: 8, 12: 8}
+GGUF_TYPE_STRING = 8
+GGUF_TYPE_ARRAY = 9
+
+# ggml tensor types: (elements per block, bytes per block)
+GGML_TYPE_SIZES = {
+    0: (1, 4),  # F32
+    1: (1, 2),  # F16
+    2: (32, 18),  # Q4_0
+    3: (32, 20),  # Q4_1
+    6: (32, 22),  # Q5_0
+    7: (32, 24),  # Q5_1
+    8: (32, 34),  # Q8_0
+    9: (32, 36),  # Q8_1
+    10: (256, 84),  # Q2_K
+    11: (256, 110),  # Q3_K
+    12: (256, 144),  # Q4_K
+    13: (256, 176),  # Q5_K
+    14: (256, 210),  # Q6_K
+    15: (256, 292),  # Q8_K
+    16: (256, 66),  # IQ2_XXS
+    17: (256, 74),  # IQ2_XS
+    18: (256, 98),  # IQ3_XXS
+    19: (256, 50),  # IQ1_S
+    20: (32, 18),  # IQ4_NL
+    21: (256, 110),  # IQ3_S
+    22: (256, 82),  # IQ2_S
+    23: (256, 136),  # IQ4_XS
+    24: (1, 1),  # I8
+    25: (1, 2),  # I16
+    26: (1, 4),  # I32
+    27: (1, 8),  # I64
+    28: (1, 8),  # F64
+    29: (256, 56),  # IQ1_M
+    30: (1, 2),  # BF16
+    34: (256, 54),  # TQ1_0
+    35: (256, 66),  # TQ2_0
+    39: (32, 17),  # MXFP4
+}
+
+
+class GGUFError(Exception):
+    pass
+
+
+def _read(f, fmt):
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise GGUFError("unexpected end of header")
+    return struct.unpack(fmt, data)[0]
+
+
+def _check_fits(f, length):
+    """
+    Rejects lengths and counts read from the header that run past the end
+    of the file, before they reach seek()/read().
+    """
+    if length > os.fstat(f.fileno()).st_size - f.tell():
+        raise GGUFError("corrupt header")
+
+
+def _skip_string(f):
+    length = _read(f, "<Q")
+    _check_fits(f, length)
+    f.seek(length, os.SEEK_CUR)
+
+
+def _read_string(f):
+    length = _read(f, "<Q")
+    _check_fits(f, length)
+    data = f.read(length)
+    if len(data) != length:
+        raise GGUFError("unexpected end of header")
+    return data.decode("utf-8", errors="replace")
+
+
+def _skip_value(f, value_type):
+    if value_type == GGUF_TYPE_STRING:
+        _skip_string(f)
+    elif value_type == GGUF_TYPE_ARRAY:
+        elem_type = _read(f, "<I")
+        count = _read(f, "<Q")
+        if elem_type in GGUF_VALUE_SIZES:
+            _check_fits(f, count * GGUF_VALUE_SIZES[elem_type])
+            f.seek(count * GGUF_VALUE_SIZES[elem_type], os.SEEK_CUR)
+        else:
+            _check_fits(f, count)
+            for _ in range(count):
+                _skip_value(f, elem_type)
+    elif value_type in GGUF_VALUE_SIZES:
+        f.seek(GGUF_VALUE_SIZES[value_type], os.SEEK_CUR)
+    else:
+        raise GGUFError(f"unknown metadata type {value_type}")
+
+
+def gguf_expected_size(path):
+    """
+    Parses the GGUF header and returns (min_size, max_size): the end of the
+    last tensor, and that end rounded up to the file's alignment.
+    Returns None if a tensor uses a type whose size is unknown.
+    """
+    with open(path, "rb") as f:
+        if f.read(4) != GGUF_MAGIC:
+            raise GGUFError("not a GGUF file")
+        version = _read(f, "<I")
+        if version < 2:
+            raise GGUFError(f"unsupported GGUF version {version}")
+        n_tensors = _read(f, "<Q")
+        n_kv = _read(f, "<Q")
+        _check_fits(f, n_tensors + n_kv)
+
+        alignment = GGUF_DEFAULT_ALIGNMENT
+        for _ in range(n_kv):
+            key = _read_string(f)
+            value_type = _read(f, "<I")
+            if key == "general.alignment" and value_type == 4:
+                alignment = _read(f, "<I")
+                if alignment == 0:
+                    raise GGUFError("corrupt header")
+            else:
+                _skip_value(f, value_type)
+
+        data_end = 0
+        unknown_type = False
+        for _ in range(n_tensors):
+            _skip_string(f)
+            n_dims = _read(f, "<I")
+            _check_fits(f, n_dims * 8)
+            n_elements = 1
+            for _ in range(n_dims):
+                n_elements *= _read(f, "<Q")
+            tensor_type = _read(f, "<I")
+            offset = _read(f, "<Q")
+            if tensor_type not in GGML_TYPE_SIZES:
+                unknown_type = True
+                continue
+            block_size, type_size = GGML_TYPE_SIZES[tensor_type]
+            data_end = max(data_end, offset + n_elements // block_size * type_size)
+
+        header_end = f.tell()
+
+    if unknown_type:
+        return None
+
+    def align(n):
+        return (n + alignment - 1) // alignment * alignment
+
+    data_start = align(header_end)
+    return data_start + data_end, data_start + align(data_end)
+
+
+def _hash_chunk(view, start):
+    return hashlib.sha256(view[start : start + CHUNK_SIZE]).digest()
+
+
+def hash_file(path, executor):
+    """
+    Returns a tree digest: SHA-256 over the SHA-256 of each 64 MiB chunk.
+    Chunks are hashed in parallel straight from a memory map (hashlib
+    releases the GIL on large buffers).
+    """
+    size = os.path.getsize(path)
+    root = hashlib.sha256()
+    if size == 0:
+        return root.hexdigest()
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            for digest in executor.map(lambda start: _hash_chunk(view, start), range(0, size, CHUNK_SIZE)):
+                root.update(digest)
+        finally:
+            view.release()
+    return root.hexdigest()
+
+
+def load_digest_cache():
+    if os.path.exists(DIGEST_CACHE):
+        try:
+            with open(DIGEST_CACHE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_digest_cache(cache):
+    tmp = DIGEST_CACHE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, DIGEST_CACHE)
+
+
+def check_file(path, executor):
+    """
+    Hashes a model and checks its size against the GGUF header.
+    Returns a cache entry dict.
+    """
+    st = os.stat(path)
+    entry = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "algo": DIGEST_ALGO,
+        "ok": True,
+        "error": None,
+    }
+    try:
+        expected = gguf_expected_size(path)
+        if expected is None:
+            entry["error"] = "unknown tensor type, size not checked"
+        elif st.st_size < expected[0]:
+            entry["ok"] = False
+            entry["error"] = f"truncated: {format_bytes(st.st_size)} < {format_bytes(expected[0])} expected"
+        elif st.st_size > expected[1]:
+            entry["ok"] = False
+            entry["error"] = f"unexpected trailing data: {format_bytes(st.st_size)} > {format_bytes(expected[1])} expected"
+    except (GGUFError, OSError) as e:
+        entry["ok"] = False
+        entry["error"] = str(e)
+
+    entry["digest"] = hash_file(path, executor)
+    return entry
+
+
+def verify_models(paths, force=False, quiet=False):
+    """
+    Verifies the given GGUF files, hashing only new or changed ones
+    (keyed by size and mtime). Returns {path: cache entry}.
+    """
+    cache = load_digest_cache()
+    results = {}
+    workers = min(8, os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path in paths:
+            if not os.path.exists(path):
+                results[path] = {"ok": False, "error": "file not found", "digest": ""}
+                continue
+            if not os.path.isfile(path):
+                results[path] = {"ok": False, "error": "not a regular file", "digest": ""}
+                continue
+
+            key = os.path.realpath(path)
+            st = os.stat(path)
+            cached = cache.get(key)
+            unchanged = (
+                cached is not None
+                and cached.get("size") == st.st_size
+                and cached.get("mtime_ns") == st.st_mtime_ns
+                and cached.get("algo") == DIGEST_ALGO
+            )
+            if unchanged and not force:
+                results[path] = cached
+                continue
+
+            message = f"Hashing {os.path.basename(path)} ({format_bytes(st.st_size)})..."
+            try:
+                if quiet:
+                    with Spinner(message):
+                        entry = check_file(path, executor)
+                else:
+                    print(message)
+                    entry = check_file(path, executor)
+            except OSError as e:
+                results[path] = {"ok": False, "error": str(e), "digest": ""}
+                continue
+
+            if unchanged and entry["digest"] != cached.get("digest"):
+                # Same size and mtime but different bytes: keep the known-good
+                # digest in the cache so the corruption stays visible
+                entry["ok"] = False
+                entry["error"] = "content changed since last verified (size and mtime unchanged)"
+                results[path] = entry
+                continue
+
+            cache[key] = entry
+            results[path] = entry
+            save_digest_cache(cache)
+
+    return results
+
+
+def write_manifest(results, path):
+    """
+    Writes '<digest>  <size>  <file name>' lines for every file that passed,
+    for comparison on another machine with load_manifest/compare_manifest.
+    """
+    with open(path, "w") as f:
+        f.write(f"# {DIGEST_ALGO}\n")
+        for model, entry in sorted(results.items(), key=lambda item: os.path.basename(item[0])):
+            if entry["ok"]:
+                f.write(f"{entry['digest']}  {entry['size']}  {os.path.basename(model)}\n")
+
+
+def load_manifest(path):
+    """
+    Returns {file name: (digest, size)} from a manifest written by write_manifest.
+    """
+    manifest = {}
+    with open(path, "r") as f:
+        header = f.readline().strip()
+        if header != f"# {DIGEST_ALGO}":
+            raise ValueError(f"unsupported manifest format: {header!r}")
+        for line in f:
+            parts = line.rstrip("\n").split("  ", 2)
+            if len(parts) == 3:
+                manifest[parts[2]] = (parts[0], int(parts[1]))
+    return manifest
+
+
+def compare_manifest(results, manifest, report_missing=True):
+    """
+    Marks files whose digest differs from the manifest as failed. Returns a
+    new results dict; files listed in the manifest but absent are added as
+    failures when report_missing is set.
+    """
+    compared = {}
+    seen = set()
+    for path, entry in results.items():
+        name = os.path.basename(path)
+        entry = dict(entry)
+        if name in manifest:
+            seen.add(name)
+            digest, size = manifest[name]
+            if entry["ok"] and (entry["digest"] != digest or entry["size"] != size):
+                entry["ok"] = False
+                entry["error"] = "digest differs from manifest"
+        elif entry["ok"]:
+            entry["error"] = "not in manifest"
+        compared[path] = entry
+
+    if report_missing:
+        for name in sorted(set(manifest) - seen):
+            compared[name] = {"ok": False, "error": "listed in manifest but missing", "digest": ""}
+    return compared
+
+
+def print_verify_report(results):
+    bad = 0
+    print()
+    for path, entry in results.items():
+        status = "OK" if entry["ok"] else "FAIL"
+        if not entry["ok"]:
+            bad += 1
+        print(f"[{status}] {os.path.basename(path)}  {entry['digest'][:16]}")
+        if entry.get("error"):
+            print(f"       {entry['error']}")
+    print("-" * 40)
+    print(f"{len(results) - bad} OK, {bad} failed")
+    return bad